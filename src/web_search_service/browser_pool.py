@@ -2,17 +2,36 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import AsyncIterator
 
 from camoufox.async_api import AsyncNewBrowser
-from playwright.async_api import BrowserContext, async_playwright
+from playwright.async_api import Browser, BrowserContext, Playwright, Route, async_playwright
 
-from web_search_service.config import Settings, settings as default_settings
+from web_search_service.config import Settings, get_settings
 
 logger = logging.getLogger(__name__)
 
+# Installed once per context so waiting for a CAPTCHA to clear (see
+# search._wait_for_captcha_resolution) only sends a short call to the page.
+CAPTCHA_CLEAR_INIT_SCRIPT = """
+window.__wsCaptchaClear = () => {
+    const body = document.body ? document.body.innerText.toLowerCase() : "";
+    return !body.includes("bots use duckduckgo") && !body.includes("captcha");
+};
+"""
+
+# Resource types that never affect the text we scrape from result pages.
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+
+async def _block_heavy_resources(route: Route) -> None:
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
 
 @dataclass
 class PoolStats:
@@ -25,64 +44,138 @@ class PoolStats:
 
 class BrowserContextPool:
     def __init__(self, settings: Settings | None = None) -> None:
-        self._settings = settings or default_settings
-        self._semaphore = asyncio.Semaphore(self._settings.browser_pool_size)
+        self._settings = settings or get_settings()
+        # Each slot holds an idle context, or None when its context has not been
+        # created yet; the queue bound is the pool's capacity.
+        self._slots: asyncio.LifoQueue[BrowserContext | None] = asyncio.LifoQueue(
+            maxsize=self._settings.browser_pool_size
+        )
+        for _ in range(self._settings.browser_pool_size):
+            self._slots.put_nowait(None)
+        self._idle = 0
+        self._recycling: set[asyncio.Task[None]] = set()
+        self._lowat = min(self._settings.browser_pool_lowat, self._settings.browser_pool_size)
+        self._hiwat = min(self._settings.browser_pool_hiwat, self._settings.browser_pool_size)
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
         self._total_acquisitions = 0
         self._total_releases = 0
 
     async def start(self) -> None:
-        logger.info("Browser pool (per-request browser) initialized with size %d", self._settings.browser_pool_size)
-
-    async def _new_browser_and_context(self) -> tuple:
-        pw = await async_playwright().start()
-        browser = await AsyncNewBrowser(
-            pw,
-            headless=self._settings.browser_headless,
+        self._playwright = await async_playwright().start()
+        contexts: list[BrowserContext] = []
+        try:
+            self._browser = await AsyncNewBrowser(
+                self._playwright,
+                headless=self._settings.browser_headless,
+            )
+            # Only the low-water mark is pre-created; the rest are created on demand.
+            for _ in range(self._lowat):
+                contexts.append(await self._create_context())
+        except BaseException:
+            for ctx in contexts:
+                await self._close_context(ctx)
+            await self._close_browser()
+            raise
+        # Live contexts sit above the empty slots, so LIFO order hands them out first.
+        for _ in contexts:
+            self._slots.get_nowait()
+        for ctx in contexts:
+            self._put(ctx)
+        logger.info(
+            "Browser pool initialized with size %d (%d contexts pre-created)",
+            self._settings.browser_pool_size,
+            self._lowat,
         )
-        ctx = await browser.new_context(
+
+    async def _create_context(self) -> BrowserContext:
+        if self._browser is None:
+            raise RuntimeError("Browser pool has not been started")
+        ctx = await self._browser.new_context(
             locale="en-US",
             timezone_id="America/New_York",
             extra_http_headers={"Accept-Encoding": "gzip, deflate"},
         )
-        return pw, browser, ctx
+        try:
+            await ctx.add_init_script(CAPTCHA_CLEAR_INIT_SCRIPT)
+            if self._settings.block_resources:
+                # Routes are registered per context, so every fresh context gets its own.
+                await ctx.route("**/*", _block_heavy_resources)
+            # Opened here so searches don't pay for new_page() on the request path.
+            await ctx.new_page()
+        except BaseException:
+            await self._close_context(ctx)
+            raise
+        return ctx
 
-    async def acquire(self) -> tuple:
+    async def acquire(self) -> BrowserContext:
         try:
-            await asyncio.wait_for(
-                self._semaphore.acquire(),
+            ctx = await asyncio.wait_for(
+                self._slots.get(),
                 timeout=self._settings.context_acquire_timeout,
             )
-        except asyncio.TimeoutError:
+        except TimeoutError:
             raise TimeoutError("Timed out waiting to acquire browser context") from None
-        try:
-            resources = await self._new_browser_and_context()
-        except Exception:
-            self._semaphore.release()
-            raise
+        if ctx is None:
+            # finally rather than except, so cancellation also hands the slot back.
+            try:
+                ctx = await self._create_context()
+            finally:
+                if ctx is None:
+                    self._put(None)
+        else:
+            self._idle -= 1
         self._total_acquisitions += 1
-        return resources
+        return ctx
+
+    async def release(self, ctx: BrowserContext, *, healthy: bool = True) -> None:
+        # Swapping the used context for a fresh one happens in the background, so
+        # the caller does not wait on browser IPC to give its slot back.
+        task = asyncio.create_task(self._recycle(ctx, healthy=healthy))
+        self._recycling.add(task)
+        task.add_done_callback(self._recycling.discard)
+        self._total_releases += 1
+
+    async def _recycle(self, ctx: BrowserContext, *, healthy: bool) -> None:
+        replacement: BrowserContext | None = None
+        try:
+            await self._close_context(ctx)
+            if healthy and self._idle < self._hiwat:
+                try:
+                    replacement = await self._create_context()
+                except Exception:
+                    logger.warning("Failed to create replacement context", exc_info=True)
+        finally:
+            self._put(replacement)
+
+    def _put(self, ctx: BrowserContext | None) -> None:
+        if ctx is not None:
+            self._idle += 1
+        self._slots.put_nowait(ctx)
 
-    async def release(self, resources: tuple, *, healthy: bool = True) -> None:
-        pw, browser, ctx = resources
+    async def _close_context(self, ctx: BrowserContext) -> None:
         try:
             await ctx.close()
         except Exception:
             logger.warning("Failed to close context", exc_info=True)
-        try:
-            await browser.close()
-        except Exception:
-            logger.warning("Failed to close browser", exc_info=True)
-        try:
-            await pw.stop()
-        except Exception:
-            logger.warning("Failed to stop Playwright", exc_info=True)
-        self._semaphore.release()
-        self._total_releases += 1
+
+    async def _close_browser(self) -> None:
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                logger.warning("Failed to close browser", exc_info=True)
+            self._browser = None
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                logger.warning("Failed to stop Playwright", exc_info=True)
+            self._playwright = None
 
     @asynccontextmanager
     async def context(self) -> AsyncIterator[BrowserContext]:
-        resources = await self.acquire()
-        pw, browser, ctx = resources
+        ctx = await self.acquire()
         healthy = True
         try:
             yield ctx
@@ -90,11 +183,11 @@ class BrowserContextPool:
             healthy = False
             raise
         finally:
-            await self.release(resources, healthy=healthy)
+            await self.release(ctx, healthy=healthy)
 
     def stats(self) -> PoolStats:
-        in_use = self._settings.browser_pool_size - self._semaphore._value  # type: ignore[attr-defined]
-        available = self._settings.browser_pool_size - in_use
+        available = self._slots.qsize()
+        in_use = self._settings.browser_pool_size - available
         return PoolStats(
             total=self._settings.browser_pool_size,
             available=available,
@@ -104,4 +197,12 @@ class BrowserContextPool:
         )
 
     async def shutdown(self) -> None:
-        logger.info("Browser pool shutdown (per-request browser mode)")
+        if self._recycling:
+            await asyncio.gather(*self._recycling, return_exceptions=True)
+        while not self._slots.empty():
+            ctx = self._slots.get_nowait()
+            if ctx is not None:
+                self._idle -= 1
+                await self._close_context(ctx)
+        await self._close_browser()
+        logger.info("Browser pool shut down")
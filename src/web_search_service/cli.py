@@ -4,15 +4,35 @@ import argparse
 import asyncio
 import shlex
 import sys
+import threading
+
+try:
+    import readline  # noqa: F401  # enables line editing and history for input()
+except ImportError:
+    pass
+
+try:
+    import uvloop
+except ImportError:  # not available on Windows; fall back to the default loop
+    uvloop = None
 
 from web_search_service.browser_pool import BrowserContextPool
 from web_search_service.config import Settings
 from web_search_service.models import SearchResult
 from web_search_service.search import execute_search
 
+# Without these, shlex.split is equivalent to a plain whitespace split.
+_SHELL_QUOTING_CHARS = frozenset("'\"\\")
+
+
+def _tokenize(raw: str) -> list[str]:
+    if _SHELL_QUOTING_CHARS.isdisjoint(raw):
+        return raw.split()
+    return shlex.split(raw)
+
 
 def _parse_input(raw: str) -> tuple[str, list[str], int]:
-    tokens = shlex.split(raw)
+    tokens = _tokenize(raw)
     query_parts: list[str] = []
     domains: list[str] = []
     n_results = 10
@@ -31,15 +51,44 @@ def _parse_input(raw: str) -> tuple[str, list[str], int]:
 
 
 def _print_results(results: list[SearchResult], effective_query: str) -> None:
-    print(f"\nEffective query: {effective_query}")
-    print(f"Results: {len(results)}\n")
+    lines = [f"\nEffective query: {effective_query}", f"Results: {len(results)}\n"]
     for r in results:
         date_str = f" [{r.date}]" if r.date else ""
-        print(f"  {r.position}.{date_str} {r.title}")
-        print(f"     {r.url}")
+        lines.append(f"  {r.position}.{date_str} {r.title}")
+        lines.append(f"     {r.url}")
         if r.snippet:
-            print(f"     {r.snippet}")
-        print()
+            lines.append(f"     {r.snippet}")
+        lines.append("")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+async def _ainput(prompt: str) -> str:
+    """Read a line on a daemon thread so the event loop keeps running meanwhile.
+
+    A daemon thread (not asyncio.to_thread) keeps Ctrl-C from waiting on a pending read.
+    """
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[str] = loop.create_future()
+
+    def _resolve(line: str | None, exc: BaseException | None) -> None:
+        if future.done():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(line)
+
+    def _read() -> None:
+        try:
+            line = input(prompt)
+        except (Exception, KeyboardInterrupt) as exc:  # noqa: BLE001
+            # Forward everything: an error left uncaught here would leave the caller waiting.
+            loop.call_soon_threadsafe(_resolve, None, exc)
+        else:
+            loop.call_soon_threadsafe(_resolve, line, None)
+
+    threading.Thread(target=_read, daemon=True).start()
+    return await future
 
 
 async def _run(headless: bool) -> None:
@@ -52,7 +101,7 @@ async def _run(headless: bool) -> None:
     try:
         while True:
             try:
-                raw = input("search> ").strip()
+                raw = (await _ainput("search> ")).strip()
             except EOFError:
                 break
 
@@ -96,8 +145,9 @@ def main() -> None:
     )
     args = parser.parse_args()
 
+    run = uvloop.run if uvloop is not None else asyncio.run
     try:
-        asyncio.run(_run(headless=not args.no_headless))
+        run(_run(headless=not args.no_headless))
     except KeyboardInterrupt:
         print("\nBye!")
         sys.exit(0)
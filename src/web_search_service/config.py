@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,8 +7,11 @@ class Settings(BaseSettings):
     model_config = {"env_prefix": "WS_"}
 
     browser_pool_size: int = 3
+    browser_pool_lowat: int = 0
+    browser_pool_hiwat: int = 3
     browser_headless: bool = True
     context_acquire_timeout: float = 30.0
+    block_resources: bool = True
 
     default_n_results: int = 10
     max_n_results: int = 50
@@ -16,12 +21,16 @@ class Settings(BaseSettings):
 
     min_action_delay: float = 0.5
     max_action_delay: float = 2.0
+    human_delay_when_headless: bool = False
 
     ddgs_timeout: int = 10
     ddgs_max_workers: int = 5
+    ddgs_domains_per_query: int = 0
 
     host: str = "0.0.0.0"
     port: int = 8080
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
@@ -4,11 +4,17 @@ import socket
 import sys
 import threading
 import time
+from concurrent.futures import Future
+
+try:
+    import readline  # noqa: F401  # enables line editing and history for input()
+except ImportError:
+    pass
 
 import httpx
 import uvicorn
 
-from web_search_service.config import settings
+from web_search_service.config import get_settings
 
 
 def _get_free_port() -> int:
@@ -17,11 +23,11 @@ def _get_free_port() -> int:
         return sock.getsockname()[1]
 
 
-def _wait_until_ready(base_url: str, timeout_s: float = 10.0) -> None:
+def _wait_until_ready(client: httpx.Client, timeout_s: float = 10.0) -> None:
     deadline = time.monotonic() + timeout_s
     while True:
         try:
-            resp = httpx.get(f"{base_url}/health", timeout=0.5)
+            resp = client.get("/health", timeout=0.5)
             if resp.status_code == 200:
                 return
         except Exception:
@@ -31,19 +37,36 @@ def _wait_until_ready(base_url: str, timeout_s: float = 10.0) -> None:
         time.sleep(0.1)
 
 
+def _start_readiness_probe(client: httpx.Client) -> Future[None]:
+    """Poll the server on a background thread so the prompt can be shown right away."""
+    ready: Future[None] = Future()
+
+    def _probe() -> None:
+        try:
+            _wait_until_ready(client)
+        except RuntimeError as exc:
+            ready.set_exception(exc)
+        else:
+            ready.set_result(None)
+
+    threading.Thread(target=_probe, daemon=True).start()
+    return ready
+
+
 def _print_results(data: dict) -> None:
-    print(f"\nEffective query: {data['effective_query']}")
-    print(f"Results: {data['total_results']}\n")
+    lines = [f"\nEffective query: {data['effective_query']}", f"Results: {data['total_results']}\n"]
     for r in data["results"]:
         date_str = f" [{r['date']}]" if r.get("date") else ""
-        print(f"  {r['position']}.{date_str} {r['title']}")
-        print(f"     {r['url']}")
+        lines.append(f"  {r['position']}.{date_str} {r['title']}")
+        lines.append(f"     {r['url']}")
         if r.get("snippet"):
-            print(f"     {r['snippet']}")
-        print()
+            lines.append(f"     {r['snippet']}")
+        lines.append("")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main() -> None:
+    settings = get_settings()
     port = _get_free_port()
     base_url = f"http://127.0.0.1:{port}"
 
@@ -54,11 +77,9 @@ def main() -> None:
     thread = threading.Thread(target=server.run, daemon=True)
     thread.start()
 
-    try:
-        _wait_until_ready(base_url)
-    except RuntimeError as exc:
-        print(f"Error: {exc}", file=sys.stderr)
-        sys.exit(1)
+    # One client for readiness polling and queries keeps a single connection alive.
+    client = httpx.Client(base_url=base_url, timeout=0.5)
+    ready = _start_readiness_probe(client)
 
     print(f"DDGS Search CLI (server on port {port}) — type 'quit' to exit")
 
@@ -75,8 +96,14 @@ def main() -> None:
                 break
 
             try:
-                resp = httpx.get(
-                    f"{base_url}/ddgs/search",
+                ready.result()
+            except RuntimeError as exc:
+                print(f"Error: {exc}", file=sys.stderr)
+                sys.exit(1)
+
+            try:
+                resp = client.get(
+                    "/ddgs/search",
                     params={"query": raw},
                     timeout=settings.ddgs_timeout + 5,
                 )
@@ -89,6 +116,8 @@ def main() -> None:
                 print(f"Error: {exc}")
     except KeyboardInterrupt:
         pass
+    finally:
+        client.close()
 
     print("\nBye!")
     server.should_exit = True
@@ -2,12 +2,18 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import re
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
 from urllib.parse import urlparse
 
 from ddgs import DDGS
 
-from web_search_service.config import Settings, settings as default_settings
+from web_search_service.config import Settings, get_settings
 from web_search_service.models import SearchResult
+from web_search_service.query import site_filter
 
 logger = logging.getLogger(__name__)
 
@@ -16,33 +22,87 @@ class DdgsSearchError(Exception):
     pass
 
 
-def _build_effective_query(query: str, domains: list[str] | None = None) -> str:
+def _build_effective_query(query: str, domains: Sequence[str] | None = None) -> str:
     if not domains:
         return query
-    domain_filter = " OR ".join(f"site:{d}" for d in domains)
+    domain_filter = site_filter(tuple(domains))
     return f"{query} {domain_filter}"
 
 
+# Matches the scheme and captures the netloc of absolute URLs, which is all
+# _hostname needs for the plain http(s) links DDGS returns.
+_NETLOC_RE = re.compile(r"[a-z][a-z0-9+.-]*://([^/?#]*)", re.IGNORECASE | re.ASCII)
+
+
+def _hostname(href: str) -> str:
+    match = _NETLOC_RE.match(href)
+    if match is None or not href.isprintable():
+        return urlparse(href).hostname or ""
+    netloc = match.group(1)
+    if "[" in netloc or "%" in netloc:
+        # IPv6 literals and zone ids need urlparse's full handling.
+        return urlparse(href).hostname or ""
+    return netloc.rpartition("@")[2].partition(":")[0].lower()
+
+
 def _map_result(position: int, raw: dict) -> SearchResult:
-    href = raw.get("href", "")
-    parsed = urlparse(href)
-    displayed_url = parsed.hostname or ""
-    return SearchResult(
+    # model_construct skips validation, so coerce the third-party payload here.
+    href = str(raw.get("href") or "")
+    displayed_url = _hostname(href)
+    return SearchResult.model_construct(
         position=position,
-        title=raw.get("title", ""),
+        title=str(raw.get("title") or ""),
         url=href,
-        snippet=raw.get("body", ""),
+        snippet=str(raw.get("body") or ""),
         displayed_url=displayed_url,
         date=None,
     )
 
 
+# Dedicated pool so DDGS searches neither starve nor are starved by other
+# asyncio.to_thread users of the loop's default executor.
+_EXECUTOR: ThreadPoolExecutor | None = None
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None or _EXECUTOR._max_workers != max_workers:
+        if _EXECUTOR is not None:
+            # Let searches already queued on the old pool finish there.
+            _EXECUTOR.shutdown(wait=False)
+        _EXECUTOR = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ddgs")
+    return _EXECUTOR
+
+
+def shutdown_executor() -> None:
+    global _EXECUTOR
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _EXECUTOR = None
+
+
+# DDGS keeps one HTTP client per search engine, so reusing an instance keeps
+# connections alive between searches. Instances are per thread because DDGS
+# does not lock its engine cache.
+_thread_local = threading.local()
+
+
+def _get_ddgs(timeout: int) -> DDGS:
+    clients: dict[int, DDGS] | None = getattr(_thread_local, "clients", None)
+    if clients is None:
+        clients = _thread_local.clients = {}
+    client = clients.get(timeout)
+    if client is None:
+        client = clients[timeout] = DDGS(timeout=timeout)
+    return client
+
+
 def _run_ddgs_search(
     effective_query: str,
     n_results: int,
     timeout: int,
 ) -> list[dict]:
-    return DDGS(timeout=timeout).text(
+    return _get_ddgs(timeout).text(
         effective_query,
         region="us-en",
         timelimit="y",
@@ -50,27 +110,110 @@ def _run_ddgs_search(
     )
 
 
+# (effective_query, n_results, ddgs_timeout, ddgs_domains_per_query, id(semaphore)):
+# everything the shared search captures from its first caller.
+_InFlightKey = tuple[str, int, int, int, int]
+
+# Searches currently running. Identical searches arriving while one is in flight
+# wait for it instead of issuing their own.
+_IN_FLIGHT: dict[_InFlightKey, asyncio.Future[list[dict]]] = {}
+
+
+def _forget_in_flight(key: _InFlightKey, task: asyncio.Future[list[dict]]) -> None:
+    if _IN_FLIGHT.get(key) is task:
+        del _IN_FLIGHT[key]
+    if not task.cancelled():
+        task.exception()  # mark retrieved even if every waiter went away
+
+
+def _chunk_domains(domains: Sequence[str] | None, size: int) -> list[Sequence[str] | None]:
+    if not domains or size <= 0 or len(domains) <= size:
+        return [domains]
+    return [domains[i : i + size] for i in range(0, len(domains), size)]
+
+
+def _merge_results(batches: list[list[dict]], n_results: int) -> list[dict]:
+    """Interleave sub-query results so every domain group is represented, dropping repeated URLs."""
+    merged: list[dict] = []
+    seen: set[str] = set()
+    for row in zip_longest(*batches):
+        for raw in row:
+            if raw is None:
+                continue
+            href = raw.get("href", "")
+            if href in seen:
+                continue
+            seen.add(href)
+            merged.append(raw)
+            if len(merged) >= n_results:
+                return merged
+    return merged
+
+
 async def execute_ddgs_search(
     query: str,
-    domains: list[str] | None = None,
+    domains: Sequence[str] | None = None,
     n_results: int = 10,
     settings: Settings | None = None,
     semaphore: asyncio.Semaphore | None = None,
 ) -> tuple[list[SearchResult], str]:
-    s = settings or default_settings
-    effective_query = _build_effective_query(query, domains)
-
-    async def _do_search() -> list[dict]:
-        return await asyncio.to_thread(
-            _run_ddgs_search, effective_query, n_results, s.ddgs_timeout
+    s = settings or get_settings()
+
+    async def _do_search(sub_query: str) -> list[dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _get_executor(s.ddgs_max_workers),
+            _run_ddgs_search,
+            sub_query,
+            n_results,
+            s.ddgs_timeout,
         )
 
-    try:
+    async def _search_groups(sub_queries: list[str]) -> list[dict]:
+        if len(sub_queries) == 1:
+            return await _do_search(sub_queries[0])
+        outcomes = await asyncio.gather(
+            *(_do_search(q) for q in sub_queries), return_exceptions=True
+        )
+        failures = [o for o in outcomes if isinstance(o, BaseException)]
+        if failures:
+            raise DdgsSearchError(
+                f"{len(failures)} of {len(outcomes)} DDGS sub-queries failed: {failures[0]}"
+            ) from failures[0]
+        return _merge_results(outcomes, n_results)
+
+    async def _admitted_search(sub_queries: list[str]) -> list[dict]:
+        # One admission slot per search, however many sub-queries it fans out to.
         if semaphore is not None:
             async with semaphore:
-                raw_results = await _do_search()
-        else:
-            raw_results = await _do_search()
+                return await _search_groups(sub_queries)
+        return await _search_groups(sub_queries)
+
+    effective_query = _build_effective_query(query, domains)
+    # Long site: filters can get truncated or down-ranked, so when
+    # ddgs_domains_per_query is set, large domain lists are split into groups
+    # that are searched in parallel and merged.
+    sub_queries = [
+        _build_effective_query(query, group)
+        for group in _chunk_domains(domains, s.ddgs_domains_per_query)
+    ]
+    key = (
+        effective_query,
+        n_results,
+        s.ddgs_timeout,
+        s.ddgs_domains_per_query,
+        id(semaphore),
+    )
+    task = _IN_FLIGHT.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_admitted_search(sub_queries))
+        _IN_FLIGHT[key] = task
+        task.add_done_callback(lambda t: _forget_in_flight(key, t))
+    try:
+        # Shielded so one caller going away does not cancel the search for the others.
+        raw_results = await asyncio.shield(task)
+    except DdgsSearchError:
+        raise
     except Exception as exc:
         raise DdgsSearchError(str(exc)) from exc
 
@@ -0,0 +1,6 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=32)
+def site_filter(domains: tuple[str, ...]) -> str:
+    return " OR ".join(f"site:{d}" for d in domains)
@@ -3,21 +3,41 @@ from __future__ import annotations
 import calendar
 import logging
 import random
-import re
 from datetime import date
-from urllib.parse import urlencode
+from functools import lru_cache
+from urllib.parse import quote_plus
 
-from playwright.async_api import BrowserContext, Page, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import BrowserContext, Page
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
-from web_search_service.config import Settings, settings as default_settings
+from web_search_service.config import Settings, get_settings
 from web_search_service.models import SearchResult
+from web_search_service.query import site_filter
 
 logger = logging.getLogger(__name__)
 
-_SNIPPET_PREFIX_RE = re.compile(
-    r"^(Today|Yesterday|\d+\s+(?:min|mins|minute|minutes|hour|hours|day|days|week|weeks|month|months|year|years)\s+ago)\s*[:\-–—]?\s*",
-    re.IGNORECASE,
+# Leading relative dates DuckDuckGo prepends to snippets: "Today", "Yesterday"
+# or "<N> <unit> ago", optionally followed by one separator character.
+_SNIPPET_DAY_WORDS = (("yesterday", 9), ("today", 5))
+_SNIPPET_AGO_UNITS = frozenset(
+    {
+        "min",
+        "mins",
+        "minute",
+        "minutes",
+        "hour",
+        "hours",
+        "day",
+        "days",
+        "week",
+        "weeks",
+        "month",
+        "months",
+        "year",
+        "years",
+    }
 )
+_SNIPPET_SEPARATORS = ":-–—"
 
 SELECTORS = {
     "result_container": "[data-testid='result']",
@@ -34,16 +54,102 @@ SELECTORS = {
     "date": "time",
 }
 
+# Runs inside the page so all results are read in a single round-trip. Each
+# container is walked once with a union of the field selectors and the matches
+# are bucketed per selector, keeping the first hit in document order. The date
+# selector is a bare tag name, so it goes through getElementsByTagName instead.
+_EXTRACT_RESULTS_JS = """
+({selectors, n}) => {
+    const text = (el) => (el ? (el.textContent || "").trim() : "");
+    const fields = [selectors.title, selectors.displayed_url, ...selectors.snippet];
+    const union = fields.join(", ");
+    const results = [];
+    for (const container of document.querySelectorAll(selectors.result_container)) {
+        if (results.length >= n) break;
+
+        const found = new Array(fields.length).fill(null);
+        for (const el of container.querySelectorAll(union)) {
+            for (let i = 0; i < fields.length; i++) {
+                if (!found[i] && el.matches(fields[i])) found[i] = el;
+            }
+        }
+
+        const titleEl = found[0];
+        const title = text(titleEl);
+        if (!title) continue;
+        const url = titleEl.getAttribute("href") || "";
+        if (!url) continue;
+
+        const displayedUrl = text(found[1]);
+        const date = text(container.getElementsByTagName(selectors.date)[0]) || null;
+
+        let snippet = "";
+        for (let i = 2; i < fields.length; i++) {
+            const el = found[i];
+            if (!el) continue;
+            snippet = text(el) || (el.innerText || "").trim();
+            if (snippet) break;
+        }
+        if (!snippet) {
+            // Fallback: pick the longest meaningful text inside the result container.
+            const skip = new Set([title, displayedUrl, date || ""]);
+            for (const el of container.querySelectorAll("div, span, p")) {
+                const normalized = (el.innerText || "").split(/\\s+/).join(" ").trim();
+                if (!normalized || skip.has(normalized) || normalized.startsWith("http")) continue;
+                if (normalized.length > snippet.length) snippet = normalized;
+            }
+        }
+
+        results.push({title, url, displayed_url: displayedUrl, date, snippet});
+    }
+    return results;
+}
+"""
+
 
 class SearchError(Exception):
     pass
 
 
+def _skip_spaces(text: str, i: int) -> int:
+    while i < len(text) and text[i].isspace():
+        i += 1
+    return i
+
+
+def _date_prefix_end(snippet: str) -> int:
+    """Return the length of a leading relative-date prefix, or 0 if there is none."""
+    head = snippet[:9].lower()
+    for word, length in _SNIPPET_DAY_WORDS:
+        if head.startswith(word):
+            return length
+
+    digits_end = 0
+    while digits_end < len(snippet) and snippet[digits_end].isdecimal():
+        digits_end += 1
+    unit_start = _skip_spaces(snippet, digits_end)
+    if digits_end == 0 or unit_start == digits_end:
+        return 0
+    unit_end = unit_start
+    while unit_end < len(snippet) and not snippet[unit_end].isspace():
+        unit_end += 1
+    if snippet[unit_start:unit_end].lower() not in _SNIPPET_AGO_UNITS:
+        return 0
+    ago_start = _skip_spaces(snippet, unit_end)
+    if ago_start == unit_end or snippet[ago_start : ago_start + 3].lower() != "ago":
+        return 0
+    return ago_start + 3
+
+
 def _sanitize_snippet(snippet: str) -> str:
     if not snippet:
         return ""
-    cleaned = _SNIPPET_PREFIX_RE.sub("", snippet).strip()
-    return cleaned
+    prefix_end = _date_prefix_end(snippet)
+    if prefix_end:
+        snippet = snippet[prefix_end:].lstrip()
+        if snippet and snippet[0] in _SNIPPET_SEPARATORS:
+            snippet = snippet[1:]
+    return snippet.strip()
 
 
 def _subtract_months(base: date, months: int) -> date:
@@ -65,6 +171,20 @@ def _date_filter_last_n_months(months: int) -> str:
     return f"{start.isoformat()}..{end.isoformat()}"
 
 
+# The date filter only changes once a day, so the fixed part of the query string
+# is built once per day and reused.
+_STATIC_PARAMS_CACHE: tuple[date | None, str] = (None, "")
+
+
+def _static_params() -> str:
+    global _STATIC_PARAMS_CACHE
+    today = date.today()
+    if _STATIC_PARAMS_CACHE[0] != today:
+        df = quote_plus(_date_filter_last_n_months(6))
+        _STATIC_PARAMS_CACHE = (today, f"kl=us-en&df={df}")
+    return _STATIC_PARAMS_CACHE[1]
+
+
 def build_search_url(
     query: str,
     domains: list[str] | None = None,
@@ -72,34 +192,49 @@ def build_search_url(
 ) -> tuple[str, str]:
     effective_query = query
     if domains:
-        domain_filter = " OR ".join(f"site:{d}" for d in domains)
+        domain_filter = site_filter(tuple(domains))
         effective_query = f"{query} {domain_filter}"
 
-    params = {
-        "q": effective_query,
-        "kl": "us-en",
-        "df": _date_filter_last_n_months(6),
-    }
-    url = f"https://duckduckgo.com/?{urlencode(params)}"
+    url = f"https://duckduckgo.com/?q={quote_plus(effective_query)}&{_static_params()}"
     return url, effective_query
 
 
-def _is_captcha(content: str) -> bool:
-    lower = content.lower()
-    return "bots use duckduckgo" in lower or "captcha" in lower
+@lru_cache(maxsize=8)
+def _delay_table(min_delay: float, max_delay: float) -> tuple[float, ...]:
+    return tuple(random.uniform(min_delay, max_delay) for _ in range(64))
+
+
+def _action_delay_ms(s: Settings) -> float:
+    return _delay_table(s.min_action_delay, s.max_action_delay)[random.getrandbits(6)] * 1000
+
+
+# Prefers the helper BrowserContextPool installs on its contexts, so polling only
+# sends a short call; any other context gets the same check inline.
+_CAPTCHA_CLEAR_JS = (
+    'typeof window.__wsCaptchaClear === "function" ? window.__wsCaptchaClear()'
+    " : !/bots use duckduckgo|captcha/.test("
+    'document.body ? document.body.innerText.toLowerCase() : "")'
+)
+
+_CAPTCHA_PROBE_JS = """
+() => {
+    const body = document.body ? document.body.innerText.toLowerCase() : "";
+    return body.includes("bots use duckduckgo") || body.includes("captcha");
+}
+"""
+
+
+async def _captcha_probe(page: Page) -> bool:
+    return bool(await page.evaluate(_CAPTCHA_PROBE_JS))
 
 
 async def _wait_for_captcha_resolution(page: Page, timeout: int = 120000) -> bool:
     """Wait for the user to solve the CAPTCHA manually. Returns True if resolved."""
-    logger.warning("CAPTCHA detected — solve it in the browser window, waiting up to %ds...", timeout // 1000)
+    logger.warning(
+        "CAPTCHA detected — solve it in the browser window, waiting up to %ds...", timeout // 1000
+    )
     try:
-        await page.wait_for_function(
-            """() => {
-                const body = document.body.innerText.toLowerCase();
-                return !body.includes('bots use duckduckgo') && !body.includes('captcha');
-            }""",
-            timeout=timeout,
-        )
+        await page.wait_for_function(_CAPTCHA_CLEAR_JS, timeout=timeout)
         logger.info("CAPTCHA resolved, continuing search")
         return True
     except Exception:
@@ -107,76 +242,21 @@ async def _wait_for_captcha_resolution(page: Page, timeout: int = 120000) -> boo
 
 
 async def _extract_results(page: Page, n_results: int) -> list[SearchResult]:
-    results: list[SearchResult] = []
-    containers = page.locator(SELECTORS["result_container"])
-    count = await containers.count()
-
-    for i in range(count):
-        if len(results) >= n_results:
-            break
-
-        container = containers.nth(i)
-
-        title_el = container.locator(SELECTORS["title"])
-        if await title_el.count() == 0:
-            continue
-        title = (await title_el.first.text_content() or "").strip()
-        if not title:
-            continue
-
-        url = await title_el.first.get_attribute("href") or ""
-        if not url:
-            continue
-
-        cite_el = container.locator(SELECTORS["displayed_url"])
-        displayed_url = ""
-        if await cite_el.count() > 0:
-            displayed_url = (await cite_el.first.text_content() or "").strip()
-
-        date_el = container.locator(SELECTORS["date"])
-        date = None
-        if await date_el.count() > 0:
-            date = (await date_el.first.text_content() or "").strip() or None
-
-        snippet = ""
-        for selector in SELECTORS["snippet"]:
-            snippet_el = container.locator(selector)
-            if await snippet_el.count() == 0:
-                continue
-            snippet = (await snippet_el.first.text_content() or "").strip()
-            if not snippet:
-                snippet = (await snippet_el.first.inner_text() or "").strip()
-            if snippet:
-                break
-        if not snippet:
-            # Fallback: pick the longest meaningful text inside the result container.
-            candidate_texts = await container.locator("div, span, p").all_inner_texts()
-            cleaned: list[str] = []
-            for text in candidate_texts:
-                normalized = " ".join(text.split()).strip()
-                if not normalized:
-                    continue
-                if normalized in {title, displayed_url, date or ""}:
-                    continue
-                if normalized.startswith("http"):
-                    continue
-                cleaned.append(normalized)
-            if cleaned:
-                snippet = max(cleaned, key=len)
-        snippet = _sanitize_snippet(snippet)
-
-        results.append(
-            SearchResult(
-                position=len(results) + 1,
-                title=title,
-                url=url,
-                snippet=snippet,
-                displayed_url=displayed_url,
-                date=date,
-            )
+    raw_results = await page.evaluate(
+        _EXTRACT_RESULTS_JS,
+        {"selectors": SELECTORS, "n": n_results},
+    )
+    return [
+        SearchResult.model_construct(
+            position=i + 1,
+            title=raw["title"],
+            url=raw["url"],
+            snippet=_sanitize_snippet(raw["snippet"]),
+            displayed_url=raw["displayed_url"],
+            date=raw["date"],
         )
-
-    return results
+        for i, raw in enumerate(raw_results)
+    ]
 
 
 async def execute_search(
@@ -186,29 +266,26 @@ async def execute_search(
     n_results: int = 10,
     settings: Settings | None = None,
 ) -> tuple[list[SearchResult], str]:
-    s = settings or default_settings
+    s = settings or get_settings()
     url, effective_query = build_search_url(query, domains, n_results)
 
-    page = await ctx.new_page()
+    # Contexts from BrowserContextPool come with a page already open; it is closed
+    # along with the context, so only a page opened here needs closing.
+    warm_pages = ctx.pages
+    page = warm_pages[0] if warm_pages else await ctx.new_page()
     try:
-        delay = random.uniform(s.min_action_delay, s.max_action_delay)
-        await page.wait_for_timeout(delay * 1000)
+        if not s.browser_headless or s.human_delay_when_headless:
+            await page.wait_for_timeout(_action_delay_ms(s))
 
         await page.goto(url, timeout=s.search_navigation_timeout, wait_until="domcontentloaded")
 
-        content = await page.content()
-        if _is_captcha(content):
-            resolved = await _wait_for_captcha_resolution(page)
-            if not resolved:
-                raise SearchError("CAPTCHA was not solved in time")
-
+        # CAPTCHA pages never show results, so only probe for one when the wait fails.
         try:
             await page.locator(SELECTORS["result_container"]).first.wait_for(
                 timeout=s.search_result_wait_timeout,
             )
         except PlaywrightTimeoutError:
-            content = await page.content()
-            if _is_captcha(content):
+            if await _captcha_probe(page):
                 resolved = await _wait_for_captcha_resolution(page)
                 if not resolved:
                     raise SearchError("CAPTCHA was not solved in time")
@@ -223,4 +300,5 @@ async def execute_search(
         logger.info("Found %d results for query: %s", len(results), query)
         return results, effective_query
     finally:
-        await page.close()
+        if not warm_pages:
+            await page.close()
@@ -4,22 +4,30 @@ import asyncio
 import json
 import logging
 import re
+from collections.abc import AsyncIterator, Sequence
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from functools import lru_cache
+from importlib import resources
 
 import uvicorn
 from fastapi import FastAPI, Query
 from fastapi.responses import JSONResponse
-from importlib import resources
 
-from web_search_service.browser_pool import BrowserContextPool
-from web_search_service.config import settings
-from web_search_service.ddgs_search import DdgsSearchError, execute_ddgs_search
-from web_search_service.models import ErrorResponse, HealthResponse, SearchResponse
-from web_search_service.search import SearchError, execute_search
+# The noqa'd imports back the disabled /search endpoint below.
+from web_search_service.browser_pool import BrowserContextPool  # noqa: F401
+from web_search_service.config import get_settings
+from web_search_service.ddgs_search import (
+    DdgsSearchError,
+    execute_ddgs_search,
+    shutdown_executor,
+)
+from web_search_service.models import ErrorResponse, HealthResponse, SearchResponse  # noqa: F401
+from web_search_service.search import SearchError, execute_search  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
 _URL_PATTERN = re.compile(r"https?://\S+", re.IGNORECASE)
 
 
@@ -30,19 +38,19 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # await pool.start()
     # app.state.pool = pool
     app.state.ddgs_semaphore = asyncio.Semaphore(settings.ddgs_max_workers)
-    yield
-    # await pool.shutdown()
+    try:
+        yield
+    finally:
+        shutdown_executor()
+        # await pool.shutdown()
 
 
 app = FastAPI(title="Web Search Service", lifespan=lifespan)
 
-_TRUSTED_DOMAINS_CACHE: list[str] | None = None
-
 
-def _load_trusted_domains() -> list[str]:
-    global _TRUSTED_DOMAINS_CACHE
-    if _TRUSTED_DOMAINS_CACHE is not None:
-        return _TRUSTED_DOMAINS_CACHE
+# Cached after the first read; call _load_trusted_domains.cache_clear() to reload.
+@lru_cache(maxsize=1)
+def _load_trusted_domains() -> tuple[str, ...]:
     try:
         data_path = resources.files("web_search_service").joinpath("trusted_domains.json")
         raw = data_path.read_text(encoding="utf-8")
@@ -52,14 +60,15 @@ def _load_trusted_domains() -> list[str]:
             domains = []
     except Exception:
         domains = []
-    _TRUSTED_DOMAINS_CACHE = [d for d in domains if isinstance(d, str) and d.strip()]
-    return _TRUSTED_DOMAINS_CACHE
+    return tuple(d for d in domains if isinstance(d, str) and d.strip())
+
+
+def _effective_domains(user_domains: list[str]) -> Sequence[str]:
+    return user_domains or _load_trusted_domains()
 
 
-def _effective_domains(user_domains: list[str]) -> list[str]:
-    if user_domains:
-        return user_domains
-    return _load_trusted_domains()
+def _has_url(query: str) -> bool:
+    return "://" in query and _URL_PATTERN.search(query) is not None
 
 
 # --- Browser-based /search endpoint (disabled) ---
@@ -69,7 +78,7 @@ def _effective_domains(user_domains: list[str]) -> list[str]:
 #     domains: list[str] = Query(default=[]),
 #     n_results: int = Query(default=settings.default_n_results, ge=1, le=settings.max_n_results),
 # ) -> SearchResponse | JSONResponse:
-#     if _URL_PATTERN.search(query):
+#     if _has_url(query):
 #         return JSONResponse(
 #             status_code=422,
 #             content={"detail": "Query must not contain URLs"},
@@ -108,7 +117,7 @@ async def ddgs_search(
     domains: list[str] = Query(default=[]),
     n_results: int = Query(default=settings.default_n_results, ge=1, le=settings.max_n_results),
 ) -> SearchResponse | JSONResponse:
-    if _URL_PATTERN.search(query):
+    if _has_url(query):
         return JSONResponse(
             status_code=422,
             content={"detail": "Query must not contain URLs"},
@@ -140,5 +149,7 @@ async def health() -> dict:
 
 
 def main() -> None:
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
     uvicorn.run(app, host=settings.host, port=settings.port)
@@ -1,7 +1,58 @@
+import asyncio
+
 import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
 
 from web_search_service.config import Settings
 
+try:
+    import uvloop
+except ImportError:  # not available on Windows; fall back to the default loop
+    uvloop = None
+
+
+def pytest_asyncio_loop_factories(config: pytest.Config, item: pytest.Item):
+    # Run tests on the same loop implementation uvicorn picks in production.
+    if uvloop is None:
+        return {"asyncio": asyncio.new_event_loop}
+    return {"uvloop": uvloop.new_event_loop}
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption("--run-slow", action="store_true", help="run tests marked slow")
+    parser.addoption(
+        "--enforce-budgets", action="store_true", help="fail tests that overrun their budget mark"
+    )
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item: pytest.Item, call: pytest.CallInfo):
+    # With --enforce-budgets, fail tests marked budget(seconds) whose body runs longer
+    # than that, so a stray sleep or un-mocked I/O shows up as a failure. Off by
+    # default: wall-clock limits flake on loaded machines.
+    outcome = yield
+    if not item.config.getoption("--enforce-budgets"):
+        return
+    report = outcome.get_result()
+    marker = item.get_closest_marker("budget")
+    if marker is None or report.when != "call" or not report.passed:
+        return
+    limit = marker.args[0]
+    if call.duration > limit:
+        report.outcome = "failed"
+        report.longrepr = f"took {call.duration * 1000:.0f}ms, budget is {limit * 1000:.0f}ms"
+
+
+def pytest_collection_modifyitems(config: pytest.Config, items: list[pytest.Item]) -> None:
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="slow; pass --run-slow to run")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
 SAMPLE_SERP_HTML = """\
 <html><body>
 <article data-testid="result">
@@ -39,6 +90,23 @@ def test_settings() -> Settings:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_serp_html() -> str:
     return SAMPLE_SERP_HTML
+
+
+@pytest.fixture(scope="session")
+def app():
+    # Imported on first use so collection (and runs that never touch the server)
+    # skip building the FastAPI app; each xdist worker builds its own.
+    from web_search_service.server import app as _app
+
+    return _app
+
+
+@pytest_asyncio.fixture(scope="session")
+async def client(app):
+    # One in-process client for the whole session; per-test app state is set by the
+    # test modules themselves.
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
@@ -0,0 +1,20 @@
+class AsyncCallRecorder:
+    """Async callable fake: records its calls and plays back side effects in order.
+
+    Each call consumes the next side effect, raising it if it is an exception;
+    once they run out, calls return ``return_value``.
+    """
+
+    def __init__(self, side_effects=(), return_value=None):
+        self.calls: list[tuple[tuple, dict]] = []
+        self._side_effects = list(side_effects)
+        self._return_value = return_value
+
+    async def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        if self._side_effects:
+            effect = self._side_effects.pop(0)
+            if isinstance(effect, BaseException):
+                raise effect
+            return effect
+        return self._return_value
@@ -1,20 +1,26 @@
 import asyncio
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from web_search_service.browser_pool import BrowserContextPool
+from web_search_service.browser_pool import (
+    CAPTCHA_CLEAR_INIT_SCRIPT,
+    BrowserContextPool,
+    _block_heavy_resources,
+)
 from web_search_service.config import Settings
 
 
-@pytest.mark.asyncio
-async def test_per_request_browser_created_and_closed():
-    pool = BrowserContextPool(settings=Settings(browser_pool_size=1))
-    pool._semaphore = asyncio.Semaphore(1)
+@pytest.fixture
+def fake_browser() -> AsyncMock:
+    browser = AsyncMock()
+    browser.new_context = AsyncMock(side_effect=lambda **kwargs: AsyncMock())
+    return browser
 
-    fake_pw = AsyncMock()
-    fake_browser = AsyncMock()
-    fake_ctx = AsyncMock()
+
+async def _started_pool(fake_browser, fake_pw=None, **overrides) -> BrowserContextPool:
+    fake_pw = fake_pw or AsyncMock()
+    pool = BrowserContextPool(settings=Settings(**{"browser_pool_size": 1, **overrides}))
 
     async def fake_start():
         return fake_pw
@@ -22,35 +28,244 @@ async def test_per_request_browser_created_and_closed():
     async def fake_new_browser(pw, headless):
         return fake_browser
 
-    async def fake_new_context(**kwargs):
-        return fake_ctx
-
     with patch("web_search_service.browser_pool.async_playwright") as mock_pw:
         mock_pw.return_value.start = fake_start
         with patch("web_search_service.browser_pool.AsyncNewBrowser", side_effect=fake_new_browser):
-            fake_browser.new_context = AsyncMock(side_effect=fake_new_context)
+            await pool.start()
+    return pool
+
+
+async def _settle(pool: BrowserContextPool) -> None:
+    await asyncio.gather(*pool._recycling)
 
-            async with pool.context() as ctx:
-                assert ctx is fake_ctx
 
-    fake_ctx.close.assert_awaited_once()
+@pytest.mark.asyncio
+async def test_browser_shared_and_used_contexts_swapped_for_fresh_ones(fake_browser):
+    fake_pw = AsyncMock()
+    pool = await _started_pool(fake_browser, fake_pw)
+    fake_browser.new_context.assert_not_awaited()
+
+    async with pool.context() as first:
+        pass
+    await _settle(pool)
+    first.close.assert_awaited_once()
+    assert fake_browser.new_context.await_count == 2
+
+    async with pool.context() as second:
+        pass
+    await _settle(pool)
+
+    assert second is not first
+    assert fake_browser.new_context.await_count == 3
+    first.clear_cookies.assert_not_awaited()
+    assert pool.stats().in_use == 0
+
+    await pool.shutdown()
     fake_browser.close.assert_awaited_once()
     fake_pw.stop.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_release_does_not_wait_for_recycling(fake_browser):
+    pool = await _started_pool(fake_browser)
+    ctx = await pool.acquire()
+
+    await pool.release(ctx)
+
+    ctx.close.assert_not_awaited()
+    await _settle(pool)
+    ctx.close.assert_awaited_once()
+    assert pool.stats().available == 1
+
+
+@pytest.mark.asyncio
+async def test_shutdown_waits_for_recycling(fake_browser):
+    created = []
+
+    def new_context(**kwargs):
+        created.append(AsyncMock())
+        return created[-1]
+
+    fake_browser.new_context = AsyncMock(side_effect=new_context)
+    pool = await _started_pool(fake_browser)
+
+    async with pool.context():
+        pass
+    await pool.shutdown()
+
+    assert len(created) == 2
+    for ctx in created:
+        ctx.close.assert_awaited_once()
+    fake_browser.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_lowat_contexts_created_on_start(fake_browser):
+    pool = await _started_pool(fake_browser, browser_pool_size=2, browser_pool_lowat=2)
+
+    assert fake_browser.new_context.await_count == 2
+    async with pool.context(), pool.context():
+        pass
+    assert fake_browser.new_context.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_contexts_above_hiwat_are_closed(fake_browser):
+    pool = await _started_pool(fake_browser, browser_pool_hiwat=0)
+
+    async with pool.context() as ctx:
+        pass
+    await _settle(pool)
+
+    ctx.close.assert_awaited_once()
+    assert fake_browser.new_context.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_context_is_closed(fake_browser):
+    pool = await _started_pool(fake_browser)
+
+    with pytest.raises(ValueError):
+        async with pool.context() as ctx:
+            raise ValueError("boom")
+    await _settle(pool)
+
+    ctx.close.assert_awaited_once()
+    assert fake_browser.new_context.await_count == 1
     assert pool.stats().in_use == 0
 
 
 @pytest.mark.asyncio
-async def test_semaphore_released_when_browser_creation_fails():
-    pool = BrowserContextPool(settings=Settings(browser_pool_size=1))
-    pool._semaphore = asyncio.Semaphore(1)
+async def test_slot_released_when_context_creation_fails(fake_browser):
+    fake_browser.new_context = AsyncMock(side_effect=RuntimeError("spawn failed"))
+    pool = await _started_pool(fake_browser)
+
+    with pytest.raises(RuntimeError, match="spawn failed"):
+        await pool.acquire()
+
+    assert pool.stats().available == 1, "pool slot should be released after failure"
+    assert pool.stats().in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_slot_released_when_acquire_cancelled_during_creation(fake_browser):
+    started = asyncio.Event()
+
+    async def slow_new_context(**kwargs):
+        started.set()
+        await asyncio.sleep(10)
 
-    with patch(
-        "web_search_service.browser_pool.async_playwright"
-    ) as mock_pw:
-        mock_pw.return_value.start = AsyncMock(side_effect=RuntimeError("spawn failed"))
+    fake_browser.new_context = slow_new_context
+    pool = await _started_pool(fake_browser)
 
-        with pytest.raises(RuntimeError, match="spawn failed"):
-            await pool.acquire()
+    task = asyncio.ensure_future(pool.acquire())
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert pool.stats().available == 1
+
+
+@pytest.mark.asyncio
+async def test_slot_returned_when_recycled_close_is_cancelled(fake_browser):
+    pool = await _started_pool(fake_browser)
+    ctx = await pool.acquire()
+    ctx.close = AsyncMock(side_effect=asyncio.CancelledError)
+
+    await pool.release(ctx)
+    await asyncio.gather(*pool._recycling, return_exceptions=True)
+
+    assert pool.stats().available == 1
+
+
+@pytest.mark.asyncio
+async def test_context_closed_when_setup_fails(fake_browser):
+    ctx = AsyncMock()
+    ctx.new_page = AsyncMock(side_effect=RuntimeError("page failed"))
+    fake_browser.new_context = AsyncMock(return_value=ctx)
+    pool = await _started_pool(fake_browser)
+
+    with pytest.raises(RuntimeError, match="page failed"):
+        await pool.acquire()
+
+    ctx.close.assert_awaited_once()
+    assert pool.stats().available == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_start_closes_what_it_created(fake_browser):
+    first = AsyncMock()
+    fake_pw = AsyncMock()
+    fake_browser.new_context = AsyncMock(side_effect=[first, RuntimeError("spawn failed")])
+
+    with pytest.raises(RuntimeError, match="spawn failed"):
+        await _started_pool(fake_browser, fake_pw, browser_pool_size=2, browser_pool_lowat=2)
+
+    first.close.assert_awaited_once()
+    fake_browser.close.assert_awaited_once()
+    fake_pw.stop.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_acquire_before_start_raises():
+    pool = BrowserContextPool(settings=Settings(browser_pool_size=1))
+
+    with pytest.raises(RuntimeError, match="not been started"):
+        await pool.acquire()
 
-    assert pool._semaphore._value == 1, "semaphore slot should be released after failure"
     assert pool.stats().in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_new_contexts_block_heavy_resources(fake_browser):
+    pool = await _started_pool(fake_browser)
+
+    async with pool.context() as ctx:
+        pass
+
+    ctx.route.assert_awaited_once_with("**/*", _block_heavy_resources)
+
+
+@pytest.mark.asyncio
+async def test_new_contexts_register_captcha_check(fake_browser):
+    pool = await _started_pool(fake_browser)
+
+    async with pool.context() as ctx:
+        pass
+
+    ctx.add_init_script.assert_awaited_once_with(CAPTCHA_CLEAR_INIT_SCRIPT)
+
+
+@pytest.mark.asyncio
+async def test_new_contexts_open_a_page(fake_browser):
+    pool = await _started_pool(fake_browser)
+
+    async with pool.context() as ctx:
+        pass
+
+    ctx.new_page.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_resource_blocking_can_be_disabled(fake_browser):
+    pool = await _started_pool(fake_browser, block_resources=False)
+
+    async with pool.context() as ctx:
+        pass
+
+    ctx.route.assert_not_awaited()
+
+
+@pytest.mark.parametrize(
+    ("resource_type", "blocked"),
+    [("image", True), ("font", True), ("stylesheet", True), ("document", False), ("xhr", False)],
+)
+async def test_block_heavy_resources(resource_type: str, blocked: bool):
+    route = AsyncMock()
+    route.request = MagicMock(resource_type=resource_type)
+
+    await _block_heavy_resources(route)
+
+    assert route.abort.await_count == int(blocked)
+    assert route.continue_.await_count == int(not blocked)
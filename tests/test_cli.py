@@ -1,7 +1,9 @@
 from io import StringIO
 from unittest.mock import patch
 
-from web_search_service.cli import _parse_input, _print_results
+import pytest
+
+from web_search_service.cli import _ainput, _parse_input, _print_results
 from web_search_service.models import SearchResult
 
 
@@ -32,6 +34,17 @@ class TestParseInput:
         query, domains, n = _parse_input('"exact phrase search"')
         assert query == "exact phrase search"
 
+    def test_quoted_option_value(self):
+        query, domains, n = _parse_input("fake news --domains 'g1.globo.com, uol.com.br' --n 2")
+        assert query == "fake news"
+        assert domains == ["g1.globo.com", "uol.com.br"]
+        assert n == 2
+
+    def test_extra_whitespace(self):
+        query, domains, n = _parse_input("  python\t asyncio   --n  4 ")
+        assert query == "python asyncio"
+        assert n == 4
+
 
 class TestPrintResults:
     def test_output_format(self):
@@ -69,3 +82,14 @@ class TestPrintResults:
             output = mock_stdout.getvalue()
 
         assert "Results: 0" in output
+
+
+class TestAinput:
+    async def test_returns_line(self):
+        with patch("builtins.input", return_value="python asyncio") as mock_input:
+            assert await _ainput("search> ") == "python asyncio"
+        mock_input.assert_called_once_with("search> ")
+
+    async def test_propagates_eof(self):
+        with patch("builtins.input", side_effect=EOFError), pytest.raises(EOFError):
+            await _ainput("search> ")
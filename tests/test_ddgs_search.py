@@ -1,14 +1,23 @@
 import asyncio
+import threading
 from unittest.mock import MagicMock, patch
+from urllib.parse import urlparse
 
 import pytest
 
+from web_search_service.config import Settings
 from web_search_service.ddgs_search import (
+    _IN_FLIGHT,
     DdgsSearchError,
     _build_effective_query,
+    _get_ddgs,
+    _get_executor,
+    _hostname,
     _map_result,
+    _run_ddgs_search,
     execute_ddgs_search,
 )
+from web_search_service.query import site_filter
 
 
 class TestBuildEffectiveQuery:
@@ -26,6 +35,11 @@ class TestBuildEffectiveQuery:
         result = _build_effective_query("python", ["a.com", "b.com", "c.com"])
         assert result == "python site:a.com OR site:b.com OR site:c.com"
 
+    def test_site_filter_is_cached(self):
+        domains = ("a.com", "b.com")
+        assert site_filter(domains) is site_filter(domains)
+        assert _build_effective_query("two", domains) == "two site:a.com OR site:b.com"
+
 
 class TestMapResult:
     def test_maps_fields_correctly(self):
@@ -51,21 +65,86 @@ class TestMapResult:
         assert result.displayed_url == ""
         assert result.date is None
 
+    def test_null_fields_are_coerced_to_strings(self):
+        result = _map_result(1, {"title": None, "href": None, "body": None})
+        assert result.title == ""
+        assert result.url == ""
+        assert result.snippet == ""
+        assert result.displayed_url == ""
+
     def test_displayed_url_extracts_hostname(self):
         raw = {"title": "T", "href": "https://sub.domain.org/path", "body": "B"}
         result = _map_result(1, raw)
         assert result.displayed_url == "sub.domain.org"
 
 
+class TestHostname:
+    @pytest.mark.parametrize(
+        ("href", "expected"),
+        [
+            ("https://Example.COM/page?q=1", "example.com"),
+            ("http://user:pw@sub.domain.org:8080/path", "sub.domain.org"),
+            ("https://a.com?next=@b.com", "a.com"),
+            ("https://[2001:db8::1]:443/x", "2001:db8::1"),
+            ("mailto:someone@example.com", ""),
+            ("/relative/path", ""),
+            ("", ""),
+        ],
+    )
+    def test_matches_urlparse(self, href: str, expected: str):
+        assert _hostname(href) == expected
+        assert _hostname(href) == (urlparse(href).hostname or "")
+
+
+class TestGetDdgs:
+    def test_reuses_client_per_thread_and_timeout(self):
+        with (
+            patch("web_search_service.ddgs_search._thread_local", threading.local()),
+            patch("web_search_service.ddgs_search.DDGS") as mock_ddgs,
+        ):
+            mock_ddgs.side_effect = lambda timeout: MagicMock(timeout=timeout)
+            first = _get_ddgs(10)
+            assert _get_ddgs(10) is first
+            assert _get_ddgs(5) is not first
+
+            other: list = []
+            thread = threading.Thread(target=lambda: other.append(_get_ddgs(10)))
+            thread.start()
+            thread.join()
+
+        assert other[0] is not first
+        assert mock_ddgs.call_count == 3
+
+    def test_run_ddgs_search_uses_cached_client(self):
+        client = MagicMock()
+        client.text.return_value = [{"title": "R"}]
+        with patch("web_search_service.ddgs_search._get_ddgs", return_value=client) as mock_get:
+            assert _run_ddgs_search("q", 3, 7) == [{"title": "R"}]
+
+        mock_get.assert_called_once_with(7)
+        client.text.assert_called_once_with("q", region="us-en", timelimit="y", max_results=3)
+
+
+class TestGetExecutor:
+    def test_rebuilds_pool_when_size_changes(self):
+        with patch("web_search_service.ddgs_search._EXECUTOR", None):
+            first = _get_executor(2)
+            assert _get_executor(2) is first
+            resized = _get_executor(3)
+            resized.shutdown()
+
+        assert resized is not first
+        assert resized._max_workers == 3
+        assert first._shutdown
+
+
 class TestExecuteDdgsSearch:
     async def test_returns_mapped_results(self):
         fake_raw = [
             {"title": "R1", "href": "https://a.com/1", "body": "Snippet 1"},
             {"title": "R2", "href": "https://b.com/2", "body": "Snippet 2"},
         ]
-        with patch(
-            "web_search_service.ddgs_search._run_ddgs_search", return_value=fake_raw
-        ):
+        with patch("web_search_service.ddgs_search._run_ddgs_search", return_value=fake_raw):
             results, effective_query = await execute_ddgs_search("test query")
 
         assert len(results) == 2
@@ -77,38 +156,184 @@ class TestExecuteDdgsSearch:
         assert results[1].snippet == "Snippet 2"
 
     async def test_domain_filtering_in_effective_query(self):
-        with patch(
-            "web_search_service.ddgs_search._run_ddgs_search", return_value=[]
-        ) as mock_run:
-            _, effective_query = await execute_ddgs_search(
-                "test", domains=["x.com", "y.com"]
-            )
+        with patch("web_search_service.ddgs_search._run_ddgs_search", return_value=[]) as mock_run:
+            _, effective_query = await execute_ddgs_search("test", domains=["x.com", "y.com"])
 
         assert effective_query == "test site:x.com OR site:y.com"
         assert mock_run.call_args[0][0] == "test site:x.com OR site:y.com"
 
     async def test_empty_results(self):
-        with patch(
-            "web_search_service.ddgs_search._run_ddgs_search", return_value=[]
-        ):
+        with patch("web_search_service.ddgs_search._run_ddgs_search", return_value=[]):
             results, _ = await execute_ddgs_search("nothing")
 
         assert results == []
 
     async def test_exception_raises_ddgs_search_error(self):
+        with (
+            patch(
+                "web_search_service.ddgs_search._run_ddgs_search",
+                side_effect=RuntimeError("network error"),
+            ),
+            pytest.raises(DdgsSearchError, match="network error"),
+        ):
+            await execute_ddgs_search("fail")
+
+    async def test_runs_on_dedicated_executor(self):
+        def fake_run(*args):
+            return [{"title": threading.current_thread().name, "href": "", "body": ""}]
+
+        with patch("web_search_service.ddgs_search._run_ddgs_search", side_effect=fake_run):
+            results, _ = await execute_ddgs_search("test")
+
+        assert results[0].title.startswith("ddgs")
+
+    async def test_identical_concurrent_queries_share_one_search(self):
+        fake_raw = [{"title": "R1", "href": "https://a.com/1", "body": "Snippet 1"}]
+        with patch(
+            "web_search_service.ddgs_search._run_ddgs_search", return_value=fake_raw
+        ) as mock_run:
+            (first, _), (second, _), (other, _) = await asyncio.gather(
+                execute_ddgs_search("same"),
+                execute_ddgs_search("same"),
+                execute_ddgs_search("different"),
+            )
+
+        assert mock_run.call_count == 2
+        assert first == second == other
+        assert first[0] is not second[0]
+
+    async def test_failed_shared_search_is_not_reused(self):
         with patch(
             "web_search_service.ddgs_search._run_ddgs_search",
-            side_effect=RuntimeError("network error"),
-        ):
-            with pytest.raises(DdgsSearchError, match="network error"):
-                await execute_ddgs_search("fail")
+            side_effect=[RuntimeError("network error"), []],
+        ) as mock_run:
+            with pytest.raises(DdgsSearchError):
+                await execute_ddgs_search("retry")
+            results, _ = await execute_ddgs_search("retry")
+
+        assert results == []
+        assert mock_run.call_count == 2
+
+    async def test_searches_with_different_settings_are_not_shared(self):
+        with patch("web_search_service.ddgs_search._run_ddgs_search", return_value=[]) as mock_run:
+            await asyncio.gather(
+                execute_ddgs_search("same", settings=Settings(ddgs_timeout=5)),
+                execute_ddgs_search("same", settings=Settings(ddgs_timeout=20)),
+                execute_ddgs_search("same", semaphore=asyncio.Semaphore(1)),
+            )
+
+        assert sorted(c.args[2] for c in mock_run.call_args_list) == [5, 10, 20]
+
+    async def test_cancelled_shared_search_releases_its_admission_wait(self):
+        semaphore = asyncio.Semaphore(1)
+        release = threading.Event()
+
+        def fake_run(effective_query, n_results, timeout):
+            if effective_query == "holder":
+                release.wait()
+            return []
+
+        with patch("web_search_service.ddgs_search._run_ddgs_search", side_effect=fake_run):
+            holder = asyncio.ensure_future(execute_ddgs_search("holder", semaphore=semaphore))
+            await asyncio.sleep(0)
+            cancelled = asyncio.ensure_future(execute_ddgs_search("b", semaphore=semaphore))
+            waiter = asyncio.ensure_future(execute_ddgs_search("c", semaphore=semaphore))
+            await asyncio.sleep(0)
+
+            # Cancel the shared search itself, which is what waits for admission.
+            next(task for key, task in _IN_FLIGHT.items() if key[0] == "b").cancel()
+            release.set()
+            await holder
+            results, _ = await asyncio.wait_for(waiter, timeout=1)
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+
+        assert results == []
+        assert not semaphore.locked()
 
     async def test_semaphore_limits_concurrency(self):
         semaphore = asyncio.Semaphore(1)
+        with patch("web_search_service.ddgs_search._run_ddgs_search", return_value=[]):
+            results, _ = await execute_ddgs_search("test", semaphore=semaphore)
+        assert results == []
+
+    async def test_large_domain_lists_split_into_parallel_queries(self):
+        def fake_run(effective_query, n_results, timeout):
+            tag = effective_query.rsplit(":", 1)[1]
+            return [
+                {"title": f"{tag} 1", "href": f"https://{tag}/1", "body": ""},
+                {"title": "shared", "href": "https://shared.com/", "body": ""},
+                {"title": f"{tag} 2", "href": f"https://{tag}/2", "body": ""},
+            ]
+
         with patch(
-            "web_search_service.ddgs_search._run_ddgs_search", return_value=[]
+            "web_search_service.ddgs_search._run_ddgs_search", side_effect=fake_run
+        ) as mock_run:
+            results, effective_query = await execute_ddgs_search(
+                "test",
+                domains=["a.com", "b.com", "c.com"],
+                n_results=4,
+                settings=Settings(ddgs_domains_per_query=2),
+            )
+
+        assert mock_run.call_count == 2
+        assert effective_query == "test site:a.com OR site:b.com OR site:c.com"
+        assert [r.url for r in results] == [
+            "https://b.com/1",
+            "https://c.com/1",
+            "https://shared.com/",
+            "https://b.com/2",
+        ]
+        assert [r.position for r in results] == [1, 2, 3, 4]
+
+    async def test_split_search_fails_when_a_sub_query_fails(self):
+        def fake_run(effective_query, n_results, timeout):
+            if "a.com" in effective_query:
+                raise RuntimeError("network error")
+            return [{"title": "B", "href": "https://b.com/", "body": ""}]
+
+        with (
+            patch("web_search_service.ddgs_search._run_ddgs_search", side_effect=fake_run),
+            pytest.raises(DdgsSearchError, match="1 of 2 DDGS sub-queries failed"),
         ):
-            results, _ = await execute_ddgs_search(
-                "test", semaphore=semaphore
+            await execute_ddgs_search(
+                "test", domains=["a.com", "b.com"], settings=Settings(ddgs_domains_per_query=1)
+            )
+
+    async def test_split_search_holds_one_admission_slot(self):
+        semaphore = asyncio.Semaphore(2)
+        saturated: list[bool] = []
+
+        def fake_run(effective_query, n_results, timeout):
+            saturated.append(semaphore.locked())
+            return []
+
+        with patch("web_search_service.ddgs_search._run_ddgs_search", side_effect=fake_run):
+            await execute_ddgs_search(
+                "test",
+                domains=["a.com", "b.com", "c.com"],
+                settings=Settings(ddgs_domains_per_query=1),
+                semaphore=semaphore,
+            )
+
+        assert saturated == [False, False, False]
+
+    async def test_domains_are_not_split_by_default(self):
+        domains = [f"d{i}.com" for i in range(20)]
+        with patch("web_search_service.ddgs_search._run_ddgs_search", return_value=[]) as mock_run:
+            _, effective_query = await execute_ddgs_search("test", domains=domains)
+
+        assert mock_run.call_count == 1
+        assert mock_run.call_args[0][0] == effective_query
+
+    async def test_split_search_raises_when_every_query_fails(self):
+        with (
+            patch(
+                "web_search_service.ddgs_search._run_ddgs_search",
+                side_effect=RuntimeError("network error"),
+            ),
+            pytest.raises(DdgsSearchError, match="network error"),
+        ):
+            await execute_ddgs_search(
+                "test", domains=["a.com", "b.com"], settings=Settings(ddgs_domains_per_query=1)
             )
-        assert results == []
@@ -1,11 +1,18 @@
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
-from playwright.async_api import TimeoutError as PlaywrightTimeoutError, async_playwright
+import pytest_asyncio
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
 
+from tests.fakes import AsyncCallRecorder
+from web_search_service.config import Settings
 from web_search_service.search import (
+    _CAPTCHA_CLEAR_JS,
     SearchError,
     _extract_results,
+    _sanitize_snippet,
     build_search_url,
     execute_search,
 )
@@ -34,21 +41,68 @@ class TestBuildSearchUrl:
         assert "df=" in url
         assert "%2E%2E" in url or ".." in url
 
+    def test_query_string_round_trips(self):
+        url, eq = build_search_url("a&b=c d", domains=["x.com"])
+        params = parse_qs(urlsplit(url).query)
+        assert params["q"] == [eq]
+        assert params["kl"] == ["us-en"]
+        assert len(params["df"]) == 1
 
+
+class TestSanitizeSnippet:
+    @pytest.mark.parametrize(
+        ("snippet", "expected"),
+        [
+            ("Today This is the snippet.", "This is the snippet."),
+            ("yesterday: Breaking news", "Breaking news"),
+            ("3 hours ago — Something happened", "Something happened"),
+            ("12 Days Ago - Older story", "Older story"),
+            ("1 min ago:text", "text"),
+            ("5 fortnights ago - unknown unit", "5 fortnights ago - unknown unit"),
+            ("2 hours later", "2 hours later"),
+            ("In 2020 things happened", "In 2020 things happened"),
+            ("  plain snippet  ", "plain snippet"),
+            ("", ""),
+        ],
+    )
+    def test_strips_relative_date_prefix(self, snippet: str, expected: str):
+        assert _sanitize_snippet(snippet) == expected
+
+
+@pytest_asyncio.fixture(scope="module")
+async def browser():
+    # Launching Chromium is the slow part, so one browser serves the whole module.
+    pw = await async_playwright().start()
+    browser = await pw.chromium.launch(headless=True)
+    yield browser
+    await browser.close()
+    await pw.stop()
+
+
+@pytest_asyncio.fixture
+async def serp_page(browser, sample_serp_html: str):
+    ctx = await browser.new_context()
+    page = await ctx.new_page()
+    await page.set_content(sample_serp_html)
+    yield page
+    await ctx.close()
+
+
+@pytest_asyncio.fixture(scope="module")
+async def extracted_results_10(browser, sample_serp_html: str):
+    # Extraction is pure in the HTML and n_results, so read-only tests share one run.
+    ctx = await browser.new_context()
+    page = await ctx.new_page()
+    await page.set_content(sample_serp_html)
+    results = await _extract_results(page, n_results=10)
+    await ctx.close()
+    return results
+
+
+@pytest.mark.slow
 class TestExtractResults:
-    @pytest.fixture
-    async def browser(self):
-        pw = await async_playwright().start()
-        browser = await pw.chromium.launch(headless=True)
-        yield browser
-        await browser.close()
-        await pw.stop()
-
-    async def test_extracts_results_from_html(self, browser, sample_serp_html: str):
-        page = await browser.new_page()
-        await page.set_content(sample_serp_html)
-        results = await _extract_results(page, n_results=10)
-        await page.close()
+    def test_extracts_results_from_html(self, extracted_results_10):
+        results = extracted_results_10
 
         assert len(results) == 3
         assert results[0].title == "First Result Title"
@@ -58,71 +112,151 @@ class TestExtractResults:
         assert results[0].date == "2 hours ago"
         assert results[0].position == 1
 
-    async def test_skips_containers_without_title(self, browser, sample_serp_html: str):
-        page = await browser.new_page()
-        await page.set_content(sample_serp_html)
-        results = await _extract_results(page, n_results=10)
-        await page.close()
+    def test_skips_containers_without_title(self, extracted_results_10):
         # 4th div.g has no h3/link, should be skipped
-        assert len(results) == 3
+        assert len(extracted_results_10) == 3
 
-    async def test_respects_n_results_limit(self, browser, sample_serp_html: str):
-        page = await browser.new_page()
-        await page.set_content(sample_serp_html)
-        results = await _extract_results(page, n_results=2)
-        await page.close()
+    async def test_respects_n_results_limit(self, serp_page):
+        results = await _extract_results(serp_page, n_results=2)
         assert len(results) == 2
 
-    async def test_second_result_has_no_date(self, browser, sample_serp_html: str):
-        page = await browser.new_page()
-        await page.set_content(sample_serp_html)
-        results = await _extract_results(page, n_results=10)
-        await page.close()
-        assert results[1].date is None
+    def test_second_result_has_no_date(self, extracted_results_10):
+        assert extracted_results_10[1].date is None
 
-    async def test_third_result_snippet(self, browser, sample_serp_html: str):
-        page = await browser.new_page()
-        await page.set_content(sample_serp_html)
-        results = await _extract_results(page, n_results=10)
-        await page.close()
-        assert "Third snippet" in results[2].snippet
-        assert "result__snippet" in results[2].snippet
+    def test_third_result_snippet(self, extracted_results_10):
+        assert "Third snippet" in extracted_results_10[2].snippet
+        assert "result__snippet" in extracted_results_10[2].snippet
 
 
 class TestExecuteSearchCaptcha:
     async def test_captcha_not_solved_raises(self):
         mock_page = AsyncMock()
-        mock_page.content = AsyncMock(return_value="<html>bots use DuckDuckGo too</html>")
-        mock_page.goto = AsyncMock()
-        mock_page.wait_for_timeout = AsyncMock()
-        mock_page.close = AsyncMock()
+        mock_page.evaluate = AsyncCallRecorder([True])
+        mock_page.goto = AsyncCallRecorder()
+        mock_page.wait_for_timeout = AsyncCallRecorder()
+        mock_page.close = AsyncCallRecorder()
         # wait_for_function times out → CAPTCHA not solved
-        mock_page.wait_for_function = AsyncMock(side_effect=TimeoutError("timed out"))
+        mock_page.wait_for_function = AsyncCallRecorder([TimeoutError("timed out")])
 
         mock_locator = MagicMock()
-        mock_locator.count = AsyncMock(return_value=0)
-        mock_locator.first = MagicMock()
-        mock_locator.first.wait_for = AsyncMock()
+        mock_locator.first.wait_for = AsyncCallRecorder([PlaywrightTimeoutError("timed out")])
         mock_page.locator = MagicMock(return_value=mock_locator)
 
-        mock_ctx = AsyncMock()
+        mock_ctx = AsyncMock(pages=[])
         mock_ctx.new_page = AsyncMock(return_value=mock_page)
 
         with pytest.raises(SearchError, match="CAPTCHA was not solved"):
             await execute_search(mock_ctx, "test query")
+        assert mock_page.wait_for_function.calls[-1][0] == (_CAPTCHA_CLEAR_JS,)
+        assert len(mock_page.close.calls) == 1
+
+    async def test_solved_captcha_on_context_without_init_script(self):
+        # A bare context never got CAPTCHA_CLEAR_INIT_SCRIPT, so the wait must not
+        # depend on the helper it installs.
+        mock_page = AsyncMock()
+        mock_page.evaluate = AsyncCallRecorder([True, []])
+        mock_page.wait_for_function = AsyncCallRecorder()
+        mock_locator = MagicMock()
+        mock_locator.first.wait_for = AsyncCallRecorder([PlaywrightTimeoutError("timed out")])
+        mock_page.locator = MagicMock(return_value=mock_locator)
+        mock_ctx = AsyncMock(pages=[])
+        mock_ctx.new_page = AsyncMock(return_value=mock_page)
+
+        results, _ = await execute_search(mock_ctx, "test query")
+
+        assert results == []
+        mock_ctx.add_init_script.assert_not_awaited()
+        expression = mock_page.wait_for_function.calls[0][0][0]
+        assert expression.startswith('typeof window.__wsCaptchaClear === "function"')
+        assert "document.body.innerText" in expression
+        assert len(mock_locator.first.wait_for.calls) == 2
+
+    async def test_no_captcha_extracts_results(self):
+        raw = {
+            "title": "T",
+            "url": "https://example.com",
+            "snippet": "Yesterday - snippet",
+            "displayed_url": "example.com",
+            "date": None,
+        }
+        mock_page = AsyncMock()
+        mock_page.evaluate = AsyncCallRecorder([[raw]])
+        mock_page.wait_for_function = AsyncCallRecorder()
+        mock_page.close = AsyncCallRecorder()
+        mock_locator = MagicMock()
+        mock_locator.first.wait_for = AsyncCallRecorder()
+        mock_page.locator = MagicMock(return_value=mock_locator)
+        mock_ctx = AsyncMock(pages=[])
+        mock_ctx.new_page = AsyncCallRecorder(return_value=mock_page)
+
+        results, _ = await execute_search(mock_ctx, "test query")
+
+        assert [r.snippet for r in results] == ["snippet"]
+        assert len(mock_ctx.new_page.calls) == 1
+        assert len(mock_page.evaluate.calls) == 1
+        assert mock_page.wait_for_function.calls == []
+        assert len(mock_page.close.calls) == 1
+
+    async def test_reuses_warm_page_without_closing_it(self):
+        mock_page = AsyncMock()
+        mock_page.goto = AsyncCallRecorder()
+        mock_page.evaluate = AsyncCallRecorder([[]])
+        mock_page.close = AsyncCallRecorder()
+        mock_locator = MagicMock()
+        mock_locator.first.wait_for = AsyncCallRecorder()
+        mock_page.locator = MagicMock(return_value=mock_locator)
+        mock_ctx = AsyncMock(pages=[mock_page])
+        mock_ctx.new_page = AsyncCallRecorder()
+
+        await execute_search(mock_ctx, "test query")
+
+        assert mock_ctx.new_page.calls == []
+        assert len(mock_page.goto.calls) == 1
+        assert mock_page.close.calls == []
 
 
 class TestExecuteSearchRetries:
     async def test_goto_timeout_raises(self):
         mock_page = AsyncMock()
-        mock_page.goto = AsyncMock(side_effect=PlaywrightTimeoutError("timed out"))
-        mock_page.content = AsyncMock(return_value="<html></html>")
-        mock_page.wait_for_timeout = AsyncMock()
-        mock_page.close = AsyncMock()
+        mock_page.goto = AsyncCallRecorder([PlaywrightTimeoutError("timed out")])
+        mock_page.wait_for_timeout = AsyncCallRecorder()
+        mock_page.close = AsyncCallRecorder()
 
-        mock_ctx = AsyncMock()
+        mock_ctx = AsyncMock(pages=[])
         mock_ctx.new_page = AsyncMock(return_value=mock_page)
 
         with pytest.raises(PlaywrightTimeoutError):
             await execute_search(mock_ctx, "test query")
-        assert mock_page.goto.call_count == 1
+        assert len(mock_page.goto.calls) == 1
+
+
+class TestExecuteSearchDelay:
+    @staticmethod
+    def _page_failing_navigation() -> AsyncMock:
+        mock_page = AsyncMock()
+        mock_page.goto = AsyncCallRecorder([PlaywrightTimeoutError("timed out")])
+        mock_page.wait_for_timeout = AsyncCallRecorder()
+        return mock_page
+
+    @pytest.mark.parametrize(
+        ("headless", "delay_when_headless", "delayed"),
+        [(True, False, False), (True, True, True), (False, False, True)],
+    )
+    async def test_delay_only_when_requested(self, headless, delay_when_headless, delayed):
+        mock_page = self._page_failing_navigation()
+        mock_ctx = AsyncMock(pages=[])
+        mock_ctx.new_page = AsyncMock(return_value=mock_page)
+        settings = Settings(
+            browser_headless=headless,
+            human_delay_when_headless=delay_when_headless,
+            min_action_delay=0.5,
+            max_action_delay=2.0,
+        )
+
+        with pytest.raises(PlaywrightTimeoutError):
+            await execute_search(mock_ctx, "test query", settings=settings)
+
+        assert len(mock_page.wait_for_timeout.calls) == int(delayed)
+        if delayed:
+            delay_ms = mock_page.wait_for_timeout.calls[0][0][0]
+            assert 500 <= delay_ms <= 2000
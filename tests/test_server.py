@@ -1,20 +1,56 @@
 import asyncio
-from unittest.mock import AsyncMock, patch
+from collections.abc import Sequence
+from unittest.mock import patch
 
 import pytest
-from httpx import ASGITransport, AsyncClient
+from httpx import AsyncClient, Response
 
+from tests.fakes import AsyncCallRecorder
 from web_search_service.ddgs_search import DdgsSearchError
 from web_search_service.models import SearchResult
-from web_search_service.server import app
 
+pytestmark = pytest.mark.budget(0.2)
 
-@pytest.fixture
-async def client():
-    app.state.ddgs_semaphore = asyncio.Semaphore(5)
-    transport = ASGITransport(app=app)
-    async with AsyncClient(transport=transport, base_url="http://test") as c:
-        yield c
+_MOCK_RESULTS = [
+    SearchResult.model_construct(
+        position=1,
+        title="DDGS Result",
+        url="https://example.com",
+        snippet="A ddgs snippet",
+        displayed_url="example.com",
+        date=None,
+    )
+]
+
+_URL_QUERIES = (
+    "http://example.com",
+    "https://example.com",
+    "check this https://example.com/page",
+)
+
+
+async def _get_all(client: AsyncClient, endpoint: str, queries: Sequence[str]) -> list[Response]:
+    # The requests are independent, so issue them concurrently.
+    return await asyncio.gather(*(client.get(endpoint, params={"query": q}) for q in queries))
+
+
+class _NoSem:
+    """Admission stand-in that never blocks; these tests don't exercise concurrency limits."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+@pytest.fixture(scope="module", autouse=True)
+def ddgs_admission(app):
+    # ASGITransport does not run the lifespan, so install what it would have, once
+    # for the whole module.
+    app.state.ddgs_semaphore = _NoSem()
+    yield
+    del app.state.ddgs_semaphore
 
 
 class TestHealth:
@@ -25,24 +61,43 @@ class TestHealth:
         assert data["status"] == "ok"
 
 
+class TestLoadTrustedDomains:
+    def test_reads_packaged_list_once(self):
+        from web_search_service.server import _load_trusted_domains
+
+        _load_trusted_domains.cache_clear()
+        domains = _load_trusted_domains()
+        assert domains and all(isinstance(d, str) for d in domains)
+        assert _load_trusted_domains() is domains
+
+
+class TestHasUrl:
+    @pytest.mark.parametrize(
+        ("query", "expected"),
+        [
+            ("plain query", False),
+            ("HTTPS://example.com", True),
+            ("see http://x.org now", True),
+            ("ftp://example.com", False),
+            ("http:// spaced", False),
+        ],
+    )
+    def test_has_url(self, query: str, expected: bool):
+        from web_search_service.server import _has_url
+
+        assert _has_url(query) is expected
+
+
 class TestDdgsSearch:
-    async def test_ddgs_search_returns_results(self, client: AsyncClient):
-        mock_results = [
-            SearchResult(
-                position=1,
-                title="DDGS Result",
-                url="https://example.com",
-                snippet="A ddgs snippet",
-                displayed_url="example.com",
-            )
-        ]
+    @pytest.fixture(autouse=True)
+    def _no_trusted_domains(self):
+        with patch("web_search_service.server._load_trusted_domains", return_value=()):
+            yield
 
-        with patch("web_search_service.server._load_trusted_domains", return_value=[]):
-            with patch(
-                "web_search_service.server.execute_ddgs_search", new_callable=AsyncMock
-            ) as mock_exec:
-                mock_exec.return_value = (mock_results, "test query")
-                resp = await client.get("/ddgs/search", params={"query": "test"})
+    async def test_ddgs_search_returns_results(self, client: AsyncClient):
+        fake_exec = AsyncCallRecorder(return_value=(_MOCK_RESULTS, "test query"))
+        with patch("web_search_service.server.execute_ddgs_search", fake_exec):
+            resp = await client.get("/ddgs/search", params={"query": "test"})
 
         assert resp.status_code == 200
         data = resp.json()
@@ -50,50 +105,50 @@ class TestDdgsSearch:
         assert len(data["results"]) == 1
         assert data["results"][0]["title"] == "DDGS Result"
 
-    @pytest.mark.parametrize(
-        "query",
-        [
-            "http://example.com",
-            "https://example.com",
-            "check this https://example.com/page",
-        ],
-    )
-    async def test_ddgs_search_query_with_url_returns_422(
-        self, client: AsyncClient, query: str
-    ):
-        resp = await client.get("/ddgs/search", params={"query": query})
-        assert resp.status_code == 422
-        assert resp.json()["detail"] == "Query must not contain URLs"
+    async def test_ddgs_search_query_with_url_returns_422(self, client: AsyncClient):
+        responses = await _get_all(client, "/ddgs/search", _URL_QUERIES)
+        for resp in responses:
+            assert resp.status_code == 422
+            assert resp.json()["detail"] == "Query must not contain URLs"
+
+    async def test_ddgs_search_queries_without_url_are_allowed(self, client: AsyncClient):
+        with patch(
+            "web_search_service.server.execute_ddgs_search",
+            AsyncCallRecorder(return_value=([], "q")),
+        ):
+            responses = await _get_all(
+                client, "/ddgs/search", ("python asyncio", "http status codes", "a://b")
+            )
+        assert [r.status_code for r in responses] == [200, 200, 200]
 
     async def test_ddgs_search_missing_query_returns_422(self, client: AsyncClient):
         resp = await client.get("/ddgs/search")
         assert resp.status_code == 422
 
-    async def test_ddgs_search_uses_trusted_domains_when_none_provided(
-        self, client: AsyncClient
-    ):
+    async def test_ddgs_search_uses_trusted_domains_when_none_provided(self, client: AsyncClient):
         with patch(
             "web_search_service.server._load_trusted_domains",
-            return_value=["a.com", "b.com"],
+            return_value=("a.com", "b.com"),
         ):
-            with patch(
-                "web_search_service.server.execute_ddgs_search",
-                new_callable=AsyncMock,
-            ) as mock_exec:
-                mock_exec.return_value = ([], "test query")
+            fake_exec = AsyncCallRecorder(return_value=([], "test query"))
+            with patch("web_search_service.server.execute_ddgs_search", fake_exec):
                 resp = await client.get("/ddgs/search", params={"query": "test"})
 
         assert resp.status_code == 200
-        assert mock_exec.call_args.kwargs["domains"] == ["a.com", "b.com"]
-
-    async def test_ddgs_search_error_returns_500(self, client: AsyncClient):
-        with patch("web_search_service.server._load_trusted_domains", return_value=[]):
-            with patch(
-                "web_search_service.server.execute_ddgs_search",
-                new_callable=AsyncMock,
-            ) as mock_exec:
-                mock_exec.side_effect = DdgsSearchError("ddgs failed")
-                resp = await client.get("/ddgs/search", params={"query": "test"})
+        assert fake_exec.calls[-1][1]["domains"] == ("a.com", "b.com")
+
+    @pytest.mark.parametrize(
+        ("exc", "status", "detail"),
+        [
+            (DdgsSearchError("ddgs failed"), 500, "ddgs failed"),
+            (RuntimeError("unexpected"), 500, "unexpected"),
+        ],
+    )
+    async def test_ddgs_search_error_mapping(
+        self, client: AsyncClient, exc: Exception, status: int, detail: str
+    ):
+        with patch("web_search_service.server.execute_ddgs_search", AsyncCallRecorder([exc])):
+            resp = await client.get("/ddgs/search", params={"query": "test"})
 
-        assert resp.status_code == 500
-        assert resp.json()["detail"] == "ddgs failed"
+        assert resp.status_code == status
+        assert resp.json()["detail"] == detail